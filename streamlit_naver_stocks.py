@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 """
 네이버 증권 기업정보(와이즈리포트) 스트림릿 앱 — 즉시 반영 버전
-- cmp_cd(종목코드) 입력 → encparam/id 토큰 자동 획득(Selenium headless)
+- cmp_cd(종목코드) 입력 → encparam/id 토큰 자동 획득(HTTP 요청, 실패 시 Selenium headless)
 - 주요재무정보(HTML 테이블), 재무제표/수익성/가치지표(JSON) 조회
 - 화면 표 + Plotly 차트 + 엑셀 다운로드(메모리 내 생성)
 - 수집/표시하기 버튼을 누르지 않아도(또는 한 번만 눌러도) 이후 모든 상호작용이 즉시 반영되도록 session_state로 제어
@@ -11,81 +11,229 @@
 import os
 import re
 import io
-import time
-import json
+import orjson
+import atexit
+import functools
+import itertools
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+import numpy as np
 import pandas as pd
-from bs4 import BeautifulSoup
+from lxml import html as lxml_html
 import streamlit as st
 import plotly.express as px
 from collections import defaultdict
-
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
 
 # ──────────────────────────────────────────────────────────────
 # 유틸 함수
 # ──────────────────────────────────────────────────────────────
 
-def to_number(s):
-    if s is None:
-        return None
-    s = str(s).strip()
-    if s in ("", "-"):
-        return None
-    s = s.replace(",", "")
-    m = re.fullmatch(r"\(([-+]?\d*\.?\d+)\)", s)
-    if m:
-        return -float(m.group(1))
-    try:
-        return float(s)
-    except Exception:
-        return None
-
+# 반복 호출 경로에서 재사용하는 정규식은 모듈 로드 시 한 번만 컴파일
+_PAREN_RE = re.compile(r"\(([-+]?\d*\.?\d+)\)")
+_WS_RE = re.compile(r"\s+")
+_YEAR_RE = re.compile(r"(20\d{2})(?:[./-]?(?:0?[1-9]|1[0-2]))?")
+_YEAR4_RE = re.compile(r"20\d\d")
+_HEADER_SKIP_RE = re.compile(r"주요재무정보|구분")
+_ENC_RE = re.compile(r"encparam\s*:\s*['\"]?([a-zA-Z0-9+/=]+)['\"]?")
+_CMPCD_RE = re.compile(r"cmp_cd\s*=\s*['\"]?([0-9]+)['\"]?")
+_BR_RE = re.compile(r"<br\s*/?>")
+_DATA_KEY_RE = re.compile(r"^DATA\d+$")
+_STOCK_CODE_RE = re.compile(r"\d{6}")
+
+def to_number_series(s: pd.Series) -> pd.Series:
+    # 셀 단위 파이썬 호출 없이 열 전체를 한 번에 숫자로 변환. 콤마 제거, (123)은 음수, 변환 불가 값은 NaN
+    s = s.astype(str).str.strip().str.replace(",", "", regex=False)
+    neg = s.str.fullmatch(_PAREN_RE)
+    num = pd.to_numeric(s.where(~neg, s.str[1:-1]), errors="coerce").astype("float64")
+    return num.where(~neg, -num)
+
+# 같은 헤더/연도 문자열이 반복되므로 순수 함수 결과를 메모이즈
+@functools.lru_cache(maxsize=512)
 def _clean_text(x: str) -> str:
-    return re.sub(r"\s+", " ", (x or "").replace("\xa0", " ").strip())
-
+    x = (x or "").replace("\xa0", " ").strip()
+    # 연속 공백이나 공백 외 whitespace(모두 isprintable()이 False)가 있을 때만 정규식 적용
+    if "  " in x or not x.isprintable():
+        x = _WS_RE.sub(" ", x)
+    return x
+
+def _node_text(el) -> str:
+    # BeautifulSoup get_text(" ")와 동일하게 하위 텍스트를 공백으로 이어 붙임
+    return " ".join(el.itertext())
+
+# lxml 파서는 스레드 간 공유가 안전하지 않으므로 스레드·인코딩별로 한 번만 만들어 재사용
+_PARSER_LOCAL = threading.local()
+
+def _html_parser(encoding: str):
+    parsers = _PARSER_LOCAL.__dict__.setdefault("parsers", {})
+    parser = parsers.get(encoding)
+    if parser is None:
+        parser = parsers[encoding] = lxml_html.HTMLParser(encoding=encoding, remove_blank_text=True)
+    return parser
+
+@functools.lru_cache(maxsize=512)
 def _extract_year_label(x: str) -> str:
     if not isinstance(x, str):
         x = str(x)
-    m = re.search(r"(20\d{2})(?:[./-]?(?:0?[1-9]|1[0-2]))?", x)
+    m = _YEAR_RE.search(x)
     return m.group(1) if m else x
 
+# ──────────────────────────────────────────────────────────────
+# HTTP 세션 (와이즈리포트 호스트에 대한 keep-alive / 커넥션 풀 재사용)
+# ──────────────────────────────────────────────────────────────
+
+@st.cache_resource(show_spinner=False)
+def _get_session() -> requests.Session:
+    session = requests.Session()
+    session.headers.update({
+        'Accept': 'application/json, text/html, */*; q=0.01',
+        'User-Agent': 'Mozilla/5.0',
+        'X-Requested-With': 'XMLHttpRequest',
+    })
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8)
+    session.mount("https://", adapter)
+    return session
+
 # ──────────────────────────────────────────────────────────────
 # encparam / id 토큰 추출
 # ──────────────────────────────────────────────────────────────
 
-@st.cache_data(show_spinner=False)
-def get_encparam_and_id(cmp_cd: str, page_key: str) -> dict:
+def _scrape_tokens(html: str):
+    enc_match = _ENC_RE.search(html)
+    id_match = _CMPCD_RE.search(html)
+    return (enc_match.group(1) if enc_match else None), (id_match.group(1) if id_match else None)
+
+def _scrape_tokens_streamed(res: requests.Response):
+    # 본문을 조각 단위로 읽다가 두 토큰이 모두 나오면 나머지는 받지 않음
+    found = {_ENC_RE: None, _CMPCD_RE: None}
+    res.encoding = res.encoding or "utf-8"
+    window = ""
+    for chunk in res.iter_content(chunk_size=8192, decode_unicode=True):
+        # 조각 경계에 걸친 토큰도 잡히도록 직전 조각의 끝부분을 이어 붙여 검사
+        window = window[-1024:] + chunk
+        for pattern in found:
+            if found[pattern] is None:
+                m = pattern.search(window)
+                # 조각 끝에 닿은 매치는 토큰이 잘렸을 수 있으므로 다음 조각에서 다시 확인
+                if m and m.end() < len(window):
+                    found[pattern] = m.group(1)
+        if all(found.values()):
+            break
+    else:
+        # 본문을 끝까지 읽었으면 끝에 닿은 매치도 온전한 토큰
+        for pattern in found:
+            if found[pattern] is None:
+                m = pattern.search(window)
+                found[pattern] = m.group(1) if m else None
+    return found[_ENC_RE], found[_CMPCD_RE]
+
+@st.cache_resource(show_spinner=False)
+def _get_driver_lock():
+    # 스크립트는 리런마다 재실행되므로 락도 cache_resource로 프로세스 전체에서 공유
+    return threading.Lock()
+
+@st.cache_resource(show_spinner=False)
+def _get_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.common.exceptions import WebDriverException
+
+    # Chrome 기동 비용이 크므로 프로세스 전체에서 드라이버 하나를 재사용
     chrome_options = Options()
     chrome_options.add_argument("--headless=new")
     chrome_options.add_argument("--disable-gpu")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--disable-extensions")
+    # 토큰은 초기 HTML에 있으므로 DOMContentLoaded까지만 기다림(하위 리소스 로딩 대기 생략)
+    chrome_options.page_load_strategy = "eager"
+    # 토큰 추출에 필요 없는 이미지는 받지 않음
+    chrome_options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+    })
 
     driver = webdriver.Chrome(options=chrome_options)
+    driver.set_page_load_timeout(10)
+    atexit.register(driver.quit)
+    # 스타일시트/폰트는 콘텐츠 설정으로 막을 수 없으므로 CDP로 URL 단위 차단(실패해도 드라이버는 그대로 사용)
     try:
-        url = f"https://navercomp.wisereport.co.kr/v2/company/{page_key}.aspx?cmp_cd={cmp_cd}"
-        driver.get(url)
-        time.sleep(2.2)
-        html = driver.page_source
-        enc_match = re.search(r"encparam\s*:\s*['\"]?([a-zA-Z0-9+/=]+)['\"]?", html)
-        id_match = re.search(r"cmp_cd\s*=\s*['\"]?([0-9]+)['\"]?", html)
-        return {
-            "cmp_cd": cmp_cd,
-            "encparam": enc_match.group(1) if enc_match else None,
-            "id": id_match.group(1) if id_match else None,
-        }
-    finally:
-        driver.quit()
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": ["*.css", "*.woff", "*.woff2", "*.ttf", "*.otf"]})
+    except WebDriverException:
+        pass
+    return driver
+
+# Selenium은 HTTP 추출이 실패했을 때만 쓰므로 이 경로에서만 지연 임포트
+def _page_source_via_selenium(url: str) -> str:
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+
+    with _get_driver_lock():
+        driver = _get_driver()
+        try:
+            try:
+                driver.get(url)
+            except TimeoutException:
+                # 페이지 로드 타임아웃은 드라이버 문제가 아니므로 로딩만 멈추고 계속 사용
+                driver.execute_script("window.stop()")
+            try:
+                WebDriverWait(driver, 5, poll_frequency=0.1).until(lambda d: "encparam" in d.page_source)
+            except TimeoutException:
+                # 시간 내에 토큰이 보이지 않아도 현재까지 렌더링된 소스로 정규식 추출 시도
+                pass
+            return driver.page_source
+        except WebDriverException:
+            # 드라이버가 죽었을 수 있으므로 기존 프로세스를 정리하고 다음 호출에서 새로 띄움
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            # 이미 종료했으므로 종료 훅도 해제해 죽은 드라이버 객체가 프로세스 끝까지 남지 않게 함
+            atexit.unregister(driver.quit)
+            _get_driver.clear()
+            raise
+
+# encparam은 일정 시간 후 만료되므로 짧은 TTL로 메모리에만 캐시
+# 작은 dict를 읽기만 하므로 cache_resource로 참조 반환(조회마다 pickle 왕복 생략)
+@st.cache_resource(show_spinner=False, ttl=600)
+def get_encparam_and_id(cmp_cd: str, page_key: str = "c1010001") -> dict:
+    url = f"https://navercomp.wisereport.co.kr/v2/company/{page_key}.aspx?cmp_cd={cmp_cd}"
+    # 토큰은 서버 렌더링 HTML에 포함되어 있으므로 우선 일반 HTTP 요청으로 추출
+    encparam, cmp_id = None, None
+    try:
+        # 일반 페이지 요청이므로 세션 기본값 중 AJAX 전용 헤더는 제외
+        with _get_session().get(url, headers={"Accept": "text/html", "X-Requested-With": None}, timeout=10, stream=True) as res:
+            res.raise_for_status()
+            encparam, cmp_id = _scrape_tokens_streamed(res)
+    except requests.RequestException:
+        pass
+
+    # 정규식이 실패한 경우에만 Selenium(headless Chrome)으로 렌더링 후 재시도
+    if not encparam or not cmp_id:
+        from selenium.common.exceptions import WebDriverException
+        try:
+            encparam, cmp_id = _scrape_tokens(_page_source_via_selenium(url))
+        except WebDriverException:
+            pass
+
+    return {
+        "cmp_cd": cmp_cd,
+        "encparam": encparam,
+        "id": cmp_id,
+    }
 
 # ──────────────────────────────────────────────────────────────
 # 주요재무정보 HTML → df_wide / df_long (중복 연도 컬럼 처리 포함)
 # ──────────────────────────────────────────────────────────────
 
-@st.cache_data(show_spinner=False)
-def fetch_main_table(cmp_cd: str, encparam: str, cmp_id: str):
+# 앱 재시작 후에도 재사용하도록 디스크에 영구 캐시. encparam은 바뀌는 토큰이므로
+# 밑줄 인자로 받아 캐시 키에서 제외(같은 종목이면 토큰이 갱신돼도 적중)
+# persist="disk"는 ttl을 지원하지 않으므로 as_of(날짜)를 키에 넣고, 날짜가 바뀌면 current_as_of()에서 비움
+@st.cache_data(persist="disk", show_spinner=False)
+def _load_main_table(cmp_cd: str, cmp_id: str, _encparam: str, as_of: str):
     url = "https://navercomp.wisereport.co.kr/v2/company/ajax/cF1001.aspx"
     cookies = {
         'setC1010001': '%5B%7B...%7D%5D',
@@ -93,57 +241,65 @@ def fetch_main_table(cmp_cd: str, encparam: str, cmp_id: str):
         'setC1040001': '%5B%7B...%7D%5D',
     }
     headers = {
-        'Accept': 'application/json, text/html, */*; q=0.01',
-        'User-Agent': 'Mozilla/5.0',
-        'X-Requested-With': 'XMLHttpRequest',
         'Referer': f'https://navercomp.wisereport.co.kr/v2/company/c1010001.aspx?cmp_cd={cmp_cd}',
     }
     params = {
         'cmp_cd': cmp_cd,
         'fin_typ': '0',
         'freq_typ': 'Y',
-        'encparam': encparam,
+        'encparam': _encparam,
         'id': cmp_id,
     }
-    res = requests.get(url, headers=headers, cookies=cookies, params=params, timeout=20)
+    res = _get_session().get(url, headers=headers, cookies=cookies, params=params, timeout=20)
     res.raise_for_status()
 
-    soup = BeautifulSoup(res.text, 'html.parser')
-    tables = soup.select("table.gHead01.all-width")
-    target = next((tb for tb in tables if "연간" in _clean_text(tb.get_text(" ")) or re.search(r"20\d\d", tb.get_text(" "))), None)
-    if not target:
+    root = lxml_html.fromstring(res.content, parser=_html_parser(res.encoding or 'utf-8'))
+    tables_xpath = (
+        "//table[contains(concat(' ', normalize-space(@class), ' '), ' gHead01 ')"
+        " and contains(concat(' ', normalize-space(@class), ' '), ' all-width ')]"
+    )
+    # '연간' 문구가 있는 첫 표는 XPath에서 바로 찾고, 없을 때만 파이썬에서 연도 패턴으로 검사
+    found = root.xpath(f"({tables_xpath})[contains(., '연간')][1]")
+    target = found[0] if found else None
+    if target is None:
+        for tb in root.xpath(tables_xpath):
+            if _YEAR4_RE.search(_node_text(tb)):
+                target = tb
+                break
+    if target is None:
         raise ValueError("연간 주요재무정보 테이블을 찾지 못했습니다.")
 
     # 헤더: 중복 컬럼 방지
-    thead_rows = target.select("thead tr")
-    year_cells = thead_rows[-1].find_all(["th", "td"]) if thead_rows else []
+    thead_rows = target.xpath(".//thead//tr")
+    year_cells = thead_rows[-1].iter("th", "td") if thead_rows else []
     year_counter = defaultdict(int)
     years = []
     for th in year_cells:
-        t = _clean_text(th.get_text(" "))
-        if t and not re.search(r"주요재무정보|구분", t):
+        t = _clean_text(_node_text(th))
+        if t and not _HEADER_SKIP_RE.search(t):
             year_counter[t] += 1
             suffix = f"_{year_counter[t]}" if year_counter[t] > 1 else ""
             years.append(t + suffix)
 
-    # 본문
-    rows = []
-    for tr in target.select("tbody tr"):
-        th = tr.find("th")
-        if not th:
+    # 본문: 행마다 XPath를 컴파일하지 않도록 셀은 iter()로 순회
+    # 행 리스트를 전치하지 않도록 처음부터 열 단위 리스트로 모음
+    metrics = []
+    cols = [[] for _ in years]
+    for tr in target.xpath(".//tbody//tr"):
+        th = next(tr.iter("th"), None)
+        if th is None:
             continue
-        metric = _clean_text(th.get_text(" "))
-        tds = tr.find_all("td")
-        values = []
-        for i in range(len(years)):
-            if i < len(tds):
-                raw = tds[i].get("title") or _clean_text(tds[i].get_text(" "))
-                values.append(to_number(raw))
-            else:
-                values.append(None)
-        rows.append([metric] + values)
-
-    df_wide = pd.DataFrame(rows, columns=["지표"] + years).set_index("지표")
+        metrics.append(_clean_text(_node_text(th)))
+        tds = itertools.islice(tr.iter("td"), len(years))
+        for col, td in itertools.zip_longest(cols, tds):
+            col.append(None if td is None else (td.get("title") or _clean_text(_node_text(td))))
+
+    # 숫자 변환은 셀 단위가 아닌 열 단위로 일괄 처리
+    df_wide = pd.DataFrame(
+        {i: to_number_series(pd.Series(col, dtype=object)).to_numpy() for i, col in enumerate(cols)},
+        index=pd.Index(metrics, name="지표"),
+    )
+    df_wide.columns = years
     df_long = (
         df_wide.reset_index()
         .melt(id_vars=["지표"], var_name="연도", value_name="값")
@@ -151,6 +307,13 @@ def fetch_main_table(cmp_cd: str, encparam: str, cmp_id: str):
     )
     return df_wide, df_long
 
+# 결과는 화면에서 읽기 전용으로만 쓰므로 cache_resource로 참조 보관(조회 시 pickle 복사 생략)
+# 재무 데이터는 자주 바뀌지 않으므로 하루 TTL
+# encparam은 10분 남짓마다 바뀌므로 밑줄 인자로 키에서 빼고, 보관 개수도 제한
+@st.cache_resource(show_spinner=False, ttl=86400, max_entries=64)
+def fetch_main_table(cmp_cd: str, _encparam: str, cmp_id: str, as_of: str):
+    return _load_main_table(cmp_cd, cmp_id, _encparam, as_of)
+
 # ──────────────────────────────────────────────────────────────
 # JSON 파싱 (재무제표 / 수익성 / 가치지표)
 # ──────────────────────────────────────────────────────────────
@@ -161,24 +324,30 @@ def parse_json_table(js: dict) -> pd.DataFrame:
     unit = js.get("UNIT", "")
     if not data:
         raise ValueError("DATA가 없습니다.")
-    labels = [re.sub(r"<br\s*/?>", " ", l).strip() for l in labels_raw]
-    year_keys = sorted([k for k in data[0] if re.match(r"^DATA\d+$", k)], key=lambda x: int(x[4:]))
+    labels = [_BR_RE.sub(" ", l).strip() for l in labels_raw]
+    year_keys = sorted([k for k in data[0] if _DATA_KEY_RE.match(k)], key=lambda x: int(x[4:]))
     if len(labels) < len(year_keys):
         labels += [f"DATA{i+1}" for i in range(len(labels), len(year_keys))]
-    rows = [[r.get("ACC_NM", "")] + [r.get(k, "") for k in year_keys] for r in data]
-    df = pd.DataFrame(rows, columns=["항목"] + labels[:len(year_keys)])
+    raw = pd.DataFrame.from_records(data, columns=["ACC_NM"] + year_keys)
+    # 값 열은 파싱 시점에 한 번만 숫자로 변환. 열별 apply 대신 전체를 1차원으로 펴서 한 번에 처리
+    cells = raw[year_keys].to_numpy(dtype=object)
+    flat = pd.to_numeric(pd.Series(cells.ravel()).astype(str).str.replace(",", "", regex=False), errors="coerce")
+    num = flat.to_numpy(dtype="float64").reshape(cells.shape)
+    df = pd.DataFrame(num, columns=labels[:len(year_keys)])
+    df.insert(0, "항목", raw["ACC_NM"].fillna(""))
     df.insert(1, "단위", unit)
-    num = df[labels[:len(year_keys)]].replace(",", "", regex=True).apply(pd.to_numeric, errors="coerce")
     if num.shape[1] >= 2:
-        last, prev = num.iloc[:, -1], num.iloc[:, -2]
-        yoy = ((last - prev) / prev * 100).where(prev != 0)
-        df["전년대비 (YoY, %)"] = yoy.round(1)
+        last, prev = num[:, -1], num[:, -2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            yoy = np.where(prev != 0, (last - prev) / prev * 100, np.nan)
+        df["전년대비 (YoY, %)"] = np.round(yoy, 1)
     else:
         df["전년대비 (YoY, %)"] = pd.NA
     return df
 
-@st.cache_data(show_spinner=False)
-def fetch_json_mode(cmp_cd: str, mode: str, encparam: str) -> pd.DataFrame:
+# _load_main_table과 같은 방식의 디스크 캐시. JSON이 아닌 응답은 예외로 올려 저장되지 않게 함
+@st.cache_data(persist="disk", show_spinner=False)
+def _load_json_mode(cmp_cd: str, mode: str, _encparam: str, as_of: str) -> pd.DataFrame:
     url = "https://navercomp.wisereport.co.kr/v2/company/cF3002.aspx" if mode == "fs" else \
           "https://navercomp.wisereport.co.kr/v2/company/cF4002.aspx"
     rpt_map = {"fs": "1", "profit": "1", "value": "5"}
@@ -188,9 +357,6 @@ def fetch_json_mode(cmp_cd: str, mode: str, encparam: str) -> pd.DataFrame:
         'setC1040001': '%5B%7B...%7D%5D',
     }
     headers = {
-        'Accept': 'application/json, text/html, */*; q=0.01',
-        'User-Agent': 'Mozilla/5.0',
-        'X-Requested-With': 'XMLHttpRequest',
         'Referer': f'https://navercomp.wisereport.co.kr/v2/company/c1040001.aspx?cmp_cd={cmp_cd}',
     }
     params = {
@@ -200,39 +366,104 @@ def fetch_json_mode(cmp_cd: str, mode: str, encparam: str) -> pd.DataFrame:
         'finGubun': 'MAIN',
         'frqTyp': '0',
         'cn': '',
-        'encparam': encparam,
+        'encparam': _encparam,
     }
-    res = requests.get(url, params=params, headers=headers, cookies=cookies, timeout=20)
+    res = _get_session().get(url, params=params, headers=headers, cookies=cookies, timeout=20)
     res.raise_for_status()
+    # bytes를 그대로 orjson에 넘겨 str 디코딩 단계 생략
+    return parse_json_table(orjson.loads(res.content))
+
+# fetch_main_table과 같은 이유로 참조 캐시. 파싱에 성공한 표만 캐시됨
+@st.cache_resource(show_spinner=False, ttl=86400, max_entries=64)
+def _fetch_json_cached(cmp_cd: str, mode: str, _encparam: str, as_of: str) -> pd.DataFrame:
+    return _load_json_mode(cmp_cd, mode, _encparam, as_of)
+
+def fetch_json_mode(cmp_cd: str, mode: str, encparam: str, as_of: str) -> pd.DataFrame:
+    # 안내 프레임은 캐시 밖에서 만들어 다음 호출(새 토큰 등)에서 다시 요청하도록 함
     try:
-        js = res.json()
-    except json.JSONDecodeError:
-        return pd.DataFrame({"메시지": ["JSON이 아니므로 표시할 수 없습니다.", res.text[:500] + "..."]})
-    return parse_json_table(js)
+        return _fetch_json_cached(cmp_cd, mode, encparam, as_of)
+    except orjson.JSONDecodeError as e:
+        return pd.DataFrame({"메시지": ["JSON이 아니므로 표시할 수 없습니다.", e.doc[:500] + "..."]})
+
+# 디스크 캐시가 채워지기 시작한 날짜(디스크에 저장되므로 재시작 후에도 유지)
+@st.cache_data(persist="disk", show_spinner=False)
+def _disk_cache_as_of() -> str:
+    return date.today().isoformat()
+
+@st.cache_resource(show_spinner=False)
+def _get_as_of_lock():
+    return threading.Lock()
+
+def current_as_of() -> str:
+    # persist="disk"는 clear() 외에는 파일을 지우지 않으므로 날짜가 바뀌면 지난 날짜 항목을 모두 비움
+    today = date.today().isoformat()
+    with _get_as_of_lock():
+        if _disk_cache_as_of() != today:
+            _load_main_table.clear()
+            _load_json_mode.clear()
+            fetch_main_table.clear()
+            _fetch_json_cached.clear()
+            _disk_cache_as_of.clear()
+            _disk_cache_as_of()
+    return today
+
+@st.cache_resource(show_spinner=False)
+def _get_executor() -> ThreadPoolExecutor:
+    # 섹션별 요청을 동시에 보내기 위한 공용 스레드 풀 (리런마다 새로 만들지 않도록 캐시)
+    return ThreadPoolExecutor(max_workers=4)
 
 # ──────────────────────────────────────────────────────────────
 # 시각화 / 엑셀 저장
 # ──────────────────────────────────────────────────────────────
 
+def _frame_key(df: pd.DataFrame):
+    # 캐시 키용 DataFrame 내용 해시 (pickle 없이 모양/컬럼/값 기준). 합계가 아닌 행별 해시를 그대로 써서 행 순서도 구분
+    return df.shape, tuple(df.columns), df.index.name, pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes()
+
+# 차트용 변환 결과는 입력 표에만 의존하므로 리런마다 다시 계산하지 않도록 캐시
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _frame_key})
 def melt_for_chart_from_main(df_long: pd.DataFrame) -> pd.DataFrame:
     out = df_long.copy()
-    out["연도"] = out["연도"].map(_extract_year_label)
+    out["연도"] = out["연도"].map({v: _extract_year_label(v) for v in out["연도"].unique()})
     return out
 
-def melt_for_chart_from_json(df_json: pd.DataFrame) -> pd.DataFrame:
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _frame_key})
+def melt_for_chart_from_json(df_json: pd.DataFrame, sel_items: tuple = ()) -> pd.DataFrame:
+    # 선택된 항목이 있으면 먼저 거른 뒤 melt해서 버려질 행을 만들지 않음
+    if sel_items and "항목" in df_json.columns:
+        df_json = df_json.loc[df_json["항목"].isin(sel_items)]
     if df_json.empty:
         return df_json
     cols = list(df_json.columns)
-    value_cols = [c for c in cols if c not in ("항목", "단위", "전년대비 (YoY, %)")]
-    out = df_json.melt(id_vars=[c for c in ["항목", "단위"] if c in df_json.columns],
-                       value_vars=value_cols, var_name="기간", value_name="값")
-    out["기간"] = out["기간"].map(_extract_year_label)
-    out["값"] = pd.to_numeric(out["값"].astype(str).str.replace(",", "", regex=False), errors="coerce")
-    return out
-
+    value_idx = [i for i, c in enumerate(cols) if c not in ("항목", "단위", "전년대비 (YoY, %)")]
+    id_cols = [c for c in ["항목", "단위"] if c in df_json.columns]
+    # melt 대신 repeat/tile로 직접 롱 포맷 구성(melt와 같은 열 우선 순서)
+    values = df_json.iloc[:, value_idx].to_numpy()
+    n_rows, n_cols = values.shape
+    out = {c: np.tile(df_json[c].to_numpy(), n_cols) for c in id_cols}
+    out["기간"] = np.repeat([_extract_year_label(cols[i]) for i in value_idx], n_rows)
+    out["값"] = values.ravel(order="F")
+    return pd.DataFrame(out)
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _frame_key})
+def sorted_unique(df: pd.DataFrame, col: str) -> list:
+    # 멀티셀렉트 옵션용 정렬된 고유값 목록
+    return np.sort(pd.unique(df[col].dropna().to_numpy())).tolist()
+
+# 같은 표/선택/차트 종류면 리런 시 Plotly 그림을 다시 만들지 않도록 캐시
+@st.cache_data(show_spinner=False, max_entries=64, hash_funcs={pd.DataFrame: _frame_key})
+def build_chart(df: pd.DataFrame, x: str, color: str, selected: tuple, chart_type: str = "line"):
+    plot_df = df.loc[df[color].isin(selected), [x, "값", color]]
+    if chart_type == "bar":
+        return px.bar(plot_df, x=x, y="값", color=color, barmode="group")
+    return px.line(plot_df, x=x, y="값", color=color, markers=True)
+
+# 리런마다 같은 표를 다시 직렬화하지 않도록 엑셀 바이트를 내용 기준으로 캐시
+@st.cache_data(show_spinner=False, max_entries=32, hash_funcs={pd.DataFrame: _frame_key})
 def to_excel_bytes(df: pd.DataFrame, sheet_name: str = "Sheet1") -> bytes:
     buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+    # 워크시트 XML을 임시 파일 대신 메모리에서 조립(constant_memory는 pandas의 열 단위 쓰기와 맞지 않아 미사용)
+    with pd.ExcelWriter(buf, engine="xlsxwriter", engine_kwargs={"options": {"in_memory": True}}) as writer:
         df.to_excel(writer, index=False if df.index.name is None else True, sheet_name=sheet_name)
     buf.seek(0)
     return buf.read()
@@ -266,24 +497,27 @@ with st.sidebar:
     # 선택적 수동 버튼(있어도 동작은 동일). 누르면 started를 True로 고정
     if st.button("수집/표시하기", type="primary"):
         kickstart()
+    # 디스크 캐시는 하루 단위로만 갱신되므로 당일 최신 데이터가 필요하면 수동으로 비움
+    if st.button("캐시 지우기"):
+        st.cache_data.clear()
+        fetch_main_table.clear()
+        _fetch_json_cached.clear()
+        get_encparam_and_id.clear()
 
 # 유효 입력이면 자동 시작(최초 1회 자동 렌더)
 if not st.session_state["started"]:
-    if cmp_cd and re.fullmatch(r"\d{6}", cmp_cd) and modes:
+    if cmp_cd and _STOCK_CODE_RE.fullmatch(cmp_cd) and modes:
         st.session_state["started"] = True
 
 # 표시 조건: started가 True이면, 이후 리런에서도 무조건 본문 출력
 if st.session_state["started"]:
-    if not cmp_cd or not re.fullmatch(r"\d{6}", cmp_cd):
+    if not cmp_cd or not _STOCK_CODE_RE.fullmatch(cmp_cd):
         st.error("종목코드는 6자리 숫자여야 합니다. 예: 005930")
         st.stop()
 
-    page_key_map = {"main": "c1010001", "fs": "c1030001", "profit": "c1040001", "value": "c1040001"}
-    entry = modes[0] if modes else "main"
-    page_key = page_key_map.get(entry, "c1010001")
-
+    # 토큰은 종목 단위로 발급되므로 항상 기업개요 페이지에서 받아 섹션 선택이 바뀌어도 캐시 재사용
     with st.spinner("토큰 준비 중..."):
-        token = get_encparam_and_id(cmp_cd, page_key)
+        token = get_encparam_and_id(cmp_cd)
     encparam, cmp_id = token.get("encparam"), token.get("id")
 
     colA, colB, colC = st.columns([1, 1, 1])
@@ -292,7 +526,20 @@ if st.session_state["started"]:
     colC.metric("ID", cmp_id or "없음")
 
     if not encparam or not cmp_id:
-        st.warning("토큰 추출 실패. 섹션을 바꾸거나 잠시 후 재시도하세요.")
+        # 일시적인 네트워크 오류 결과가 TTL 동안 남지 않도록 실패한 토큰은 캐시에서 바로 제거
+        get_encparam_and_id.clear(cmp_cd)
+        st.warning("토큰 추출 실패. 잠시 후 ‘수집/표시하기’를 다시 누르거나 새로고침해 재시도하세요.")
+
+    # 섹션별 요청을 먼저 모두 띄워 두고, 렌더링 시점에 결과를 기다림
+    executor = _get_executor()
+    as_of = current_as_of()
+    jobs = {}
+    for mode in modes:
+        if mode == "main":
+            if encparam and cmp_id:
+                jobs[mode] = executor.submit(fetch_main_table, cmp_cd, encparam, cmp_id, as_of)
+        elif encparam:
+            jobs[mode] = executor.submit(fetch_json_mode, cmp_cd, mode, encparam, as_of)
 
     for mode in modes:
         st.markdown("---")
@@ -300,41 +547,42 @@ if st.session_state["started"]:
 
         if mode == "main":
             if encparam and cmp_id:
-                df_wide, df_long = fetch_main_table(cmp_cd, encparam, cmp_id)
+                df_wide, df_long = jobs[mode].result()
                 tabs = st.tabs(["와이드", "롱(연도별)"])
                 with tabs[0]:
-                    st.dataframe(df_wide, use_container_width=True)
-                    xls = to_excel_bytes(df_wide.reset_index(), sheet_name="main_wide")
+                    st.dataframe(df_wide, width="stretch")
+                    # 엑셀 바이트는 다운로드 버튼을 누를 때만 생성(콜러블 전달)
+                    xls = functools.partial(to_excel_bytes, df_wide.reset_index(), sheet_name="main_wide")
                     st.download_button("엑셀 다운로드 (와이드)", data=xls, file_name=f"{cmp_cd}_main_wide.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
                 with tabs[1]:
-                    st.dataframe(df_long, use_container_width=True)
-                    xls2 = to_excel_bytes(df_long, sheet_name="main_long")
+                    st.dataframe(df_long, width="stretch")
+                    xls2 = functools.partial(to_excel_bytes, df_long, sheet_name="main_long")
                     st.download_button("엑셀 다운로드 (롱)", data=xls2, file_name=f"{cmp_cd}_main_long.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
                     chart_df = melt_for_chart_from_main(df_long)
+                    metric_options = sorted_unique(chart_df, "지표")
                     sel_metrics = st.multiselect(
                         "차트 지표 선택",
-                        options=sorted(chart_df["지표"].unique()),
-                        default=sorted(chart_df["지표"].unique())[:3],
+                        options=metric_options,
+                        default=metric_options[:3],
                         key=f"main_metrics_{cmp_cd}",
                         on_change=kickstart  # 선택 변경 즉시 반영 (표시모드 유지)
                     )
                     if sel_metrics:
-                        plot_df = chart_df[chart_df["지표"].isin(sel_metrics)]
-                        fig = px.line(plot_df, x="연도", y="값", color="지표", markers=True)
-                        st.plotly_chart(fig, use_container_width=True)
+                        fig = build_chart(chart_df, "연도", "지표", tuple(sel_metrics))
+                        st.plotly_chart(fig, width="stretch")
             else:
                 st.info("토큰 없음. main 섹션 생략.")
         else:
             if encparam:
-                df = fetch_json_mode(cmp_cd, mode, encparam)
-                st.dataframe(df, use_container_width=True)
-                xls = to_excel_bytes(df, sheet_name=mode)
+                df = jobs[mode].result()
+                st.dataframe(df, width="stretch")
+                xls = functools.partial(to_excel_bytes, df, sheet_name=mode)
                 st.download_button("엑셀 다운로드", data=xls, file_name=f"{cmp_cd}_{mode}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-                json_long = melt_for_chart_from_json(df)
+                item_options = sorted_unique(df, "항목") if "항목" in df.columns else []
                 sel_items = st.multiselect(
                     "항목 선택",
-                    options=sorted(json_long["항목"].unique()) if not json_long.empty else [],
-                    default=(sorted(json_long["항목"].unique())[:3] if not json_long.empty else []),
+                    options=item_options,
+                    default=item_options[:3],
                     key=f"{mode}_items_{cmp_cd}",
                     on_change=kickstart  # 선택 변경 즉시 반영
                 )
@@ -344,14 +592,10 @@ if st.session_state["started"]:
                     horizontal=True,
                     key=f"{mode}_charttype_{cmp_cd}"
                 )
-                filtered = json_long[json_long["항목"].isin(sel_items)] if not json_long.empty else pd.DataFrame()
-                if not filtered.empty:
-                    fig = (
-                        px.line(filtered, x="기간", y="값", color="항목", markers=True)
-                        if chart_type == "line"
-                        else px.bar(filtered, x="기간", y="값", color="항목", barmode="group")
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
+                json_long = melt_for_chart_from_json(df, tuple(sel_items)) if sel_items else pd.DataFrame()
+                if not json_long.empty:
+                    fig = build_chart(json_long, "기간", "항목", tuple(sel_items), chart_type)
+                    st.plotly_chart(fig, width="stretch")
             else:
                 st.info(f"encparam 없음. {mode} 섹션 생략.")
 else: